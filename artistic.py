@@ -1,10 +1,16 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, Scale, colorchooser, Listbox
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image, ImageTk, ImageDraw, ImageColor
+import numpy as np
 import configparser
 import os
 import sys
+import queue
+import socket
+import struct
+import threading
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 
 # Ignoruj ostrzeżenia o przestarzałych pakietach
@@ -108,25 +114,299 @@ class SplashScreen:
         self.root.destroy()
         self.root.quit()
 
+# Piksel RGBA upakowany w jedną liczbę (R w najmłodszym bajcie)
+PIXEL = np.dtype("<u4")
+
+# Liczba pikseli składanych naraz - porcja mieści się w cache procesora
+CHUNK_PIXELS = 1 << 15
+
+def scale_pixels(pixels, factor, out=None):
+    """Mnoży wszystkie cztery kanały upakowanych pikseli przez factor/255"""
+    # Kanały R/B i G/A liczone parami w 16-bitowych połówkach, zaokrąglone dzielenie przez 255;
+    # operacje w miejscu, bo przy dużych canvasach koszt to głównie nowe tablice
+    rb = np.bitwise_and(pixels, 0x00FF00FF, dtype=PIXEL)
+    ag = np.right_shift(pixels, 8, dtype=PIXEL)
+    ag &= 0x00FF00FF
+    rb *= factor
+    ag *= factor
+    rb += 0x00800080
+    ag += 0x00800080
+    carry = rb >> 8
+    carry &= 0x00FF00FF
+    rb += carry
+    np.right_shift(ag, 8, out=carry)
+    carry &= 0x00FF00FF
+    ag += carry
+    rb >>= 8
+    rb &= 0x00FF00FF
+    ag &= 0xFF00FF00
+    return np.bitwise_or(rb, ag, out=out)
+
+def composite_over(composite, pixels, opacity=255):
+    """Nakłada piksele premultiplied na kompozyt w miejscu: src + dst * (1 - src_alpha)"""
+    rows = max(1, CHUNK_PIXELS // pixels.shape[1])
+    for top in range(0, pixels.shape[0], rows):
+        target = composite[top:top + rows]
+        source = pixels[top:top + rows]
+        if opacity < 255:
+            # W premultiplied alpha przezroczystość to jedno mnożenie wszystkich kanałów
+            source = scale_pixels(source, opacity)
+        inverse_alpha = source >> 24
+        np.subtract(255, inverse_alpha, out=inverse_alpha)
+        scale_pixels(target, inverse_alpha, out=target)
+        target += source
+
 class Layer:
     def __init__(self, name, width, height, visible=True, opacity=255):
         self.name = name
-        self.image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        # Piksele warstwy w premultiplied alpha (wysokość x szerokość x RGBA, uint8)
+        self.buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        self.bounds = None  # Pusta warstwa nie ma treści
         self.visible = visible
         self.opacity = opacity
-        self.draw = ImageDraw.Draw(self.image)
-        
-    def get_image(self):
-        if self.visible:
-            if self.opacity < 255:
-                # Adjust opacity
-                alpha = self.image.split()[3]
-                alpha = alpha.point(lambda p: p * self.opacity // 255)
-                result = self.image.copy()
-                result.putalpha(alpha)
-                return result
-            return self.image
-        return None
+        
+    @property
+    def pixels(self):
+        return self.buffer
+        
+    @pixels.setter
+    def pixels(self, pixels):
+        self.buffer = pixels
+        # Prostokąt z niepustą treścią - poza nim warstwa jest w pełni przezroczysta.
+        # W premultiplied alpha wystarczy kanał alpha, czyli najstarszy bajt upakowanego piksela.
+        packed = pixels.view(PIXEL)[..., 0]
+        rows = np.flatnonzero(packed.max(axis=1) >> 24)
+        if not rows.size:
+            self.bounds = None
+            return
+        columns = np.flatnonzero(packed[rows[0]:rows[-1] + 1].max(axis=0) >> 24)
+        self.bounds = (int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1)
+        
+    def snapshot(self):
+        """Oddaje bieżący bufor do historii, a warstwa dalej pracuje na kopii"""
+        buffer = self.buffer
+        self.buffer = buffer.copy()
+        return buffer, self.bounds
+        
+    def restore(self, buffer, bounds):
+        """Przywraca bufor z historii bez kopiowania (następne save_state go odłączy)"""
+        self.buffer = buffer
+        self.bounds = bounds
+        
+    @property
+    def image(self):
+        """Kopia warstwy jako zwykły obraz RGBA (straight alpha) do zapisu i eksportu"""
+        # Pillow mapuje bufor bez kopiowania tylko dla trybów z Image._MAPMODES, a RGBa do nich
+        # nie należy - dlatego nie ma widoku PIL na bufor, tylko kopia przy zapisie
+        height, width = self.buffer.shape[:2]
+        return Image.frombytes("RGBa", (width, height), self.buffer).convert("RGBA")
+        
+    @image.setter
+    def image(self, image):
+        width, height = image.size
+        buffer = np.empty((height, width, 4), dtype=np.uint8)
+        # Konwersja pasami - przy dużych obrazach nie powstają pełnowymiarowe kopie pośrednie
+        rows = max(1, (1 << 20) // max(1, width))
+        for top in range(0, height, rows):
+            strip = image.crop((0, top, width, min(top + rows, height)))
+            if strip.mode != "RGBA":
+                strip = strip.convert("RGBA")
+            buffer[top:top + strip.height] = np.asarray(strip.convert("RGBa"))
+        self.pixels = buffer
+        
+    def get_pixels(self, box):
+        """Zwraca (x, y, piksele) niepustej części warstwy w obrębie box albo None
+
+        Przezroczystość warstwy nakłada composite_over.
+        """
+        if not self.visible or not self.opacity or not self.bounds:
+            return None
+        left, top = max(box[0], self.bounds[0]), max(box[1], self.bounds[1])
+        right, bottom = min(box[2], self.bounds[2]), min(box[3], self.bounds[3])
+        if left >= right or top >= bottom:
+            return None
+        pixels = self.buffer[top:bottom, left:right].view(PIXEL)[..., 0]
+        return left - box[0], top - box[1], pixels
+        
+    def paint_line(self, box, points, size, color=None):
+        """Rysuje odcinek pędzla w obrębie box; color=None oznacza gumkę"""
+        height, width = self.buffer.shape[:2]
+        left, top = box[:2]
+        right, bottom = min(box[2], width), min(box[3], height)
+        if left >= right or top >= bottom:
+            return
+        
+        # Maska pociągnięcia rysowana tylko w obrębie zmienionego prostokąta; ImageDraw nie
+        # wygładza linii, więc piksel jest albo w pełni pokryty, albo nietknięty
+        mask = Image.new("1", (right - left, bottom - top), 0)
+        ImageDraw.Draw(mask).line([(x - left, y - top) for x, y in points], fill=1, width=size)
+        covered = np.asarray(mask)
+        
+        region = self.buffer[top:bottom, left:right].view(PIXEL)[..., 0]
+        if color is None:
+            # Gumka: pokryte piksele stają się w pełni przezroczyste (0 w premultiplied alpha)
+            region[covered] = 0
+        else:
+            # Kolor pędzla jest nieprzezroczysty, więc premultiplied = zwykły RGB z alpha 255
+            region[covered] = int.from_bytes(bytes(color) + b"\xff", "little")
+            bounds = self.bounds or (left, top, right, bottom)
+            self.bounds = (min(bounds[0], left), min(bounds[1], top),
+                           max(bounds[2], right), max(bounds[3], bottom))
+
+def band_boxes(width, height, workers):
+    """Dzieli canvas na poziome pasma dla kompozycji równoległej"""
+    # Małe canvasy nie zyskują na wątkach - narzut puli jest większy niż zysk
+    if width * height < 512 * 512:
+        return []
+    band_height = max(64, -(-height // (workers * 2)))
+    return [(0, top, width, min(top + band_height, height)) for top in range(0, height, band_height)]
+
+def composite_box(layers, box):
+    """Składa widoczne warstwy w obrębie prostokąta na białym tle, zwraca obraz RGB"""
+    # Zacznij od białego tła zamiast przezroczystego :cite[2]
+    size = (box[2] - box[0], box[3] - box[1])
+    composite = np.full((size[1], size[0]), 0xFFFFFFFF, dtype=PIXEL)
+    
+    # Połącz wszystkie widoczne warstwy - tylko tam, gdzie mają treść
+    for layer in layers:
+        visible = layer.get_pixels(box)
+        if visible:
+            x, y, pixels = visible
+            composite_over(composite[y:y + pixels.shape[0], x:x + pixels.shape[1]], pixels, layer.opacity)
+    
+    # Tło jest nieprzezroczyste, więc wynik to od razu RGB (Tkinter nie obsługuje alpha w Canvas)
+    return Image.frombytes("RGB", size, composite, "raw", "RGBX")
+
+class LiveClient:
+    """Jeden odbiorca wyjścia na żywo - własna kolejka i wątek wysyłający
+
+    Wolny odbiorca gubi tylko swoje ramki, a po SEND_TIMEOUT sekundach
+    zablokowanego wysyłania jest rozłączany. Nie wstrzymuje pozostałych.
+    """
+    SEND_TIMEOUT = 2.0
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.conn.settimeout(self.SEND_TIMEOUT)
+        self.frames = queue.Queue(maxsize=8)
+        self.need_keyframe = True  # Nowy klient zaczyna od pełnej klatki
+        self.closed = False
+        threading.Thread(target=self.send_loop, daemon=True).start()
+
+    def send(self, frame):
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            # Pominięta ramka - następna dla tego klienta musi być pełna
+            self.need_keyframe = True
+
+    def send_loop(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            try:
+                self.conn.sendall(frame)
+            except OSError:
+                break  # Klient się rozłączył albo nie czyta (socket.timeout)
+        self.close()
+
+    def close(self):
+        self.closed = True
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)  # Przerywa zablokowane sendall
+        except OSError:
+            pass
+        self.conn.close()
+        # Opróżnij kolejkę, żeby znacznik końca zmieścił się bez czekania
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            self.frames.put_nowait(None)
+        except queue.Full:
+            pass
+
+class LiveOutput:
+    """Publikuje kompozyt canvasa na lokalnym sockecie jako ramki delta
+
+    Każda ramka to nagłówek HEADER (magic, numer ramki, rozmiar canvasa,
+    prostokąt x, y, w, h) i surowe piksele RGB tego prostokąta. Nowy klient
+    dostaje najpierw pełną ramkę, potem już tylko zmienione prostokąty.
+    """
+    HEADER = struct.Struct("<4s7I")
+    MAGIC = b"ARTF"
+
+    def __init__(self, host, port):
+        self.server = socket.create_server((host, port))
+        self.clients = []
+        self.lock = threading.Lock()
+        self.frame_number = 0
+        self.closed = False
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                break  # Socket serwera został zamknięty
+            try:
+                client = LiveClient(conn)
+            except OSError:
+                conn.close()  # Klient rozłączył się, zanim zdążyliśmy go obsłużyć
+                continue
+            with self.lock:
+                if self.closed:
+                    client.close()
+                    break
+                self.clients.append(client)
+
+    def needs_keyframe(self):
+        with self.lock:
+            return any(client.need_keyframe for client in self.clients)
+
+    def publish(self, image, box=None):
+        """Wysyła prostokąt box obrazu RGB (None = cała klatka)"""
+        with self.lock:
+            self.clients = [client for client in self.clients if not client.closed]
+            clients = list(self.clients)
+        if not clients:
+            return
+        
+        # Ramki budujemy raz i współdzielimy między klientami
+        frames = {}
+        def frame(region_box):
+            if region_box not in frames:
+                region = image.crop(region_box)
+                self.frame_number += 1
+                header = self.HEADER.pack(self.MAGIC, self.frame_number, image.width, image.height,
+                                          region_box[0], region_box[1], region.width, region.height)
+                frames[region_box] = header + region.tobytes()
+            return frames[region_box]
+        
+        for client in clients:
+            if box is None or client.need_keyframe:
+                client.need_keyframe = False
+                client.send(frame((0, 0) + image.size))
+            else:
+                client.send(frame(box))
+
+    def close(self):
+        # Samo close() nie budzi accept() w drugim wątku - port zostałby zajęty
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        with self.lock:
+            self.closed = True
+            clients, self.clients = self.clients, []
+        for client in clients:
+            client.close()
 
 class DrawingApp:
     def __init__(self, root):
@@ -170,6 +450,19 @@ class DrawingApp:
         self.history = deque(maxlen=100)
         self.redo_history = deque(maxlen=100)
         
+        # Pula wątków do kompozycji pasmowej (operacje NumPy zwalniają GIL, Image.alpha_composite nie)
+        self.composite_workers = int(self.config.get('Settings', 'composite_workers', fallback=0)) or os.cpu_count() or 1
+        self.composite_pool = ThreadPoolExecutor(max_workers=self.composite_workers) if self.composite_workers > 1 else None
+        
+        # Wyjście na żywo dla programów do streamowania (OBS itp.)
+        self.live_output = None
+        self.live_poll_id = None
+        
+        # Znacznik trwającego wczytywania obrazu w tle (None = brak)
+        self.loading_image = None
+        # Warstwy sprzed wczytywania - wracają, jeśli obraz się nie wczyta
+        self.layers_before_loading = None
+        
         # Setup UI - najpierw tworzymy interfejs
         self.setup_ui()
         
@@ -182,8 +475,13 @@ class DrawingApp:
         # Aktualizacja wyświetlanego obrazu
         self.update_canvas()
         
+        if self.config.getboolean('LiveOutput', 'enabled', fallback=False):
+            self.toggle_live_output()
+        
     def add_layer(self, name):
         """Dodaje nową warstwę"""
+        if self.loading_image:
+            return  # Warstwy i historia są zablokowane, dopóki podgląd nie zostanie zastąpiony obrazem
         new_layer = Layer(name, self.canvas_width, self.canvas_height)
         self.layers.append(new_layer)
         self.active_layer_index = len(self.layers) - 1
@@ -192,6 +490,8 @@ class DrawingApp:
         
     def remove_layer(self, index):
         """Usuwa warstwę"""
+        if self.loading_image:
+            return
         if len(self.layers) > 1:  # Zawsze zostaw przynajmniej jedną warstwę
             del self.layers[index]
             if self.active_layer_index >= index:
@@ -208,6 +508,8 @@ class DrawingApp:
         
     def toggle_layer_visibility(self, index):
         """Przełącza widoczność warstwy"""
+        if self.loading_image:
+            return
         if 0 <= index < len(self.layers):
             self.layers[index].visible = not self.layers[index].visible
             self.update_layer_list()
@@ -215,6 +517,8 @@ class DrawingApp:
         
     def move_layer_up(self, index):
         """Przesuwa warstwę w górę"""
+        if self.loading_image:
+            return
         if index > 0:
             self.layers[index], self.layers[index-1] = self.layers[index-1], self.layers[index]
             if self.active_layer_index == index:
@@ -226,6 +530,8 @@ class DrawingApp:
         
     def move_layer_down(self, index):
         """Przesuwa warstwę w dół"""
+        if self.loading_image:
+            return
         if index < len(self.layers) - 1:
             self.layers[index], self.layers[index+1] = self.layers[index+1], self.layers[index]
             if self.active_layer_index == index:
@@ -250,30 +556,82 @@ class DrawingApp:
         if not self.layers:
             return Image.new("RGB", (self.canvas_width, self.canvas_height), "white")
             
-        # Zacznij od białego tła zamiast przezroczystego :cite[2]
-        composite = Image.new("RGBA", (self.canvas_width, self.canvas_height), (255, 255, 255, 255))
-        
-        # Połącz wszystkie widoczne warstwy
-        for layer in self.layers:
-            layer_image = layer.get_image()
-            if layer_image:
-                composite = Image.alpha_composite(composite, layer_image)
-        
-        # Konwertuj do RGB dla wyświetlania (Tkinter nie obsługuje alpha w Canvas)
-        return composite.convert("RGB")
-        
-    def update_canvas(self):
-        """Aktualizuje wyświetlany obraz na canvasie"""
-        composite_image = self.get_composite_image()
+        bands = self.composite_bands() if self.composite_pool else []
+        if len(bands) < 2:
+            return self.composite_band((0, 0, self.canvas_width, self.canvas_height))
+        
+        # Każde pasmo jest składane w osobnym wątku, a potem wklejane do wyniku
+        composite = Image.new("RGB", (self.canvas_width, self.canvas_height))
+        for band_box, band in zip(bands, self.composite_pool.map(self.composite_band, bands)):
+            composite.paste(band, band_box[:2])
+        return composite
+        
+    def composite_bands(self):
+        """Dzieli canvas na poziome pasma dla kompozycji równoległej"""
+        return band_boxes(self.canvas_width, self.canvas_height, self.composite_workers)
+        
+    def composite_band(self, box):
+        """Składa widoczne warstwy w obrębie jednego pasma"""
+        return composite_box(self.layers, box)
+        
+    def update_canvas(self, box=None):
+        """Aktualizuje wyświetlany obraz na canvasie (box = tylko zmieniony prostokąt)"""
+        composite_image = getattr(self, 'composite_image', None)
+        if box and composite_image is not None and composite_image.size == (self.canvas_width, self.canvas_height):
+            # Składamy ponownie tylko brudny prostokąt
+            composite_image.paste(self.composite_band(box), box[:2])
+        else:
+            box = None
+            composite_image = self.composite_image = self.get_composite_image()
         self.tk_image = ImageTk.PhotoImage(composite_image)
         self.canvas.delete("all")
         self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_image)
+        if self.live_output:
+            self.live_output.publish(composite_image, box)
+        
+    def dirty_box(self, x0, y0, x1, y1, margin):
+        """Prostokąt zmieniony przez odcinek pędzla, przycięty do canvasa"""
+        left = max(0, min(x0, x1) - margin)
+        top = max(0, min(y0, y1) - margin)
+        right = min(self.canvas_width, max(x0, x1) + margin + 1)
+        bottom = min(self.canvas_height, max(y0, y1) + margin + 1)
+        if left >= right or top >= bottom:
+            return None
+        return (left, top, right, bottom)
+        
+    def toggle_live_output(self):
+        """Włącza/wyłącza wyjście canvasa na lokalnym sockecie"""
+        if self.live_output:
+            # Zaległe wywołanie z after() zastałoby po ponownym włączeniu nowe wyjście i zdublowało pętlę
+            self.root.after_cancel(self.live_poll_id)
+            self.live_poll_id = None
+            self.live_output.close()
+            self.live_output = None
+        else:
+            host = self.config.get('LiveOutput', 'host', fallback='127.0.0.1')
+            port = self.config.getint('LiveOutput', 'port', fallback=7717)
+            try:
+                self.live_output = LiveOutput(host, port)
+            except OSError as e:
+                messagebox.showerror("Błąd", f"Nie udało się uruchomić wyjścia na żywo: {e}")
+                return
+            self.poll_live_output()
+        self.live_btn.config(text="Live: ON" if self.live_output else "Live: OFF")
+        
+    def poll_live_output(self):
+        """Wysyła pełną klatkę nowym i zaległym klientom, nawet gdy nikt nie rysuje"""
+        if not self.live_output:
+            return
+        if self.live_output.needs_keyframe() and hasattr(self, 'composite_image'):
+            self.live_output.publish(self.composite_image)
+        self.live_poll_id = self.root.after(200, self.poll_live_output)
         
     def save_state(self):
         """Zapisuje aktualny stan wszystkich warstw do historii"""
         state = []
         for layer in self.layers:
-            state.append((layer.name, layer.image.copy(), layer.visible, layer.opacity))
+            pixels, bounds = layer.snapshot()
+            state.append((layer.name, pixels, bounds, layer.visible, layer.opacity))
         
         if hasattr(self, 'current_state'):
             self.history.append(self.current_state)
@@ -282,18 +640,19 @@ class DrawingApp:
         
     def undo(self, event=None):
         """Cofnij ostatnią akcję"""
+        if self.loading_image:
+            return
         if self.history:
             self.redo_history.append(self.current_state)
             self.current_state = self.history.pop()
             
             # Przywróć warstwy
             self.layers = []
-            for name, image, visible, opacity in self.current_state:
+            for name, pixels, bounds, visible, opacity in self.current_state:
                 layer = Layer(name, self.canvas_width, self.canvas_height)
-                layer.image = image
+                layer.restore(pixels, bounds)
                 layer.visible = visible
                 layer.opacity = opacity
-                layer.draw = ImageDraw.Draw(layer.image)
                 self.layers.append(layer)
                 
             self.update_layer_list()
@@ -301,18 +660,19 @@ class DrawingApp:
         
     def redo(self, event=None):
         """Przywróć ostatnio cofniętą akcję"""
+        if self.loading_image:
+            return
         if self.redo_history:
             self.history.append(self.current_state)
             self.current_state = self.redo_history.pop()
             
             # Przywróć warstwy
             self.layers = []
-            for name, image, visible, opacity in self.current_state:
+            for name, pixels, bounds, visible, opacity in self.current_state:
                 layer = Layer(name, self.canvas_width, self.canvas_height)
-                layer.image = image
+                layer.restore(pixels, bounds)
                 layer.visible = visible
                 layer.opacity = opacity
-                layer.draw = ImageDraw.Draw(layer.image)
                 self.layers.append(layer)
                 
             self.update_layer_list()
@@ -325,6 +685,13 @@ class DrawingApp:
 icon_path = icon.ico
 canvas_width = 800
 canvas_height = 600
+composite_workers = 0
+downsample_on_import = false
+
+[LiveOutput]
+enabled = false
+host = 127.0.0.1
+port = 7717
 
 [Keybinds]
 save = Control-s
@@ -468,6 +835,10 @@ remove_layer = Control-Shift-L
             self.psd_btn = tk.Button(toolbar, text="Install PSD Support", command=self.install_psd_support)
             self.psd_btn.pack(side=tk.LEFT, padx=2, pady=2)
         
+        # Live output toggle
+        self.live_btn = tk.Button(toolbar, text="Live: OFF", command=self.toggle_live_output)
+        self.live_btn.pack(side=tk.LEFT, padx=2, pady=2)
+        
         # Canvas - ZMIANA: białe tło zamiast szarego :cite[2]
         self.canvas = tk.Canvas(right_panel, width=self.canvas_width, height=self.canvas_height, bg='white')
         self.canvas.pack(fill=tk.BOTH, expand=True)
@@ -538,6 +909,8 @@ remove_layer = Control-Shift-L
         
     def start_drawing(self, event):
         """Start drawing"""
+        if self.loading_image:
+            return  # Podgląd zostanie zastąpiony pełnym obrazem - nie rysujemy po nim
         self.is_drawing = True
         self.last_x, self.last_y = event.x, event.y
         self.save_state()  # Zapisz stan przed rozpoczęciem rysowania
@@ -548,16 +921,18 @@ remove_layer = Control-Shift-L
             # Rysuj na aktywnej warstwie
             active_layer = self.layers[self.active_layer_index]
             
-            if self.current_tool == 'brush':
-                active_layer.draw.line([(self.last_x, self.last_y), (event.x, event.y)], 
-                              fill=self.color, width=self.brush_size)
-            elif self.current_tool == 'eraser':
-                # Dla gumki używamy przezroczystego koloru
-                active_layer.draw.line([(self.last_x, self.last_y), (event.x, event.y)], 
-                              fill=(0, 0, 0, 0), width=self.brush_size)
+            box = self.dirty_box(self.last_x, self.last_y, event.x, event.y, self.brush_size)
+            line = [(self.last_x, self.last_y), (event.x, event.y)]
             
-            # Rysuj na canvasie
-            self.update_canvas()
+            if box and self.current_tool == 'brush':
+                active_layer.paint_line(box, line, self.brush_size, ImageColor.getrgb(self.color)[:3])
+            elif box and self.current_tool == 'eraser':
+                # Dla gumki nie podajemy koloru - piksele są wygaszane
+                active_layer.paint_line(box, line, self.brush_size)
+            
+            # Rysuj na canvasie - tylko obszar zmieniony przez ten odcinek
+            if box:
+                self.update_canvas(box)
             
         self.last_x = event.x
         self.last_y = event.y
@@ -577,6 +952,9 @@ remove_layer = Control-Shift-L
         
     def save_image(self, event=None):
         """Save image"""
+        if self.loading_image:
+            messagebox.showinfo("Informacja", "Poczekaj, aż obraz zostanie wczytany")
+            return
         file_path = filedialog.askssaveasfilename(defaultextension=".png", 
                                                 filetypes=[("PNG files", "*.png"), 
                                                           ("JPEG files", "*.jpg"), 
@@ -591,6 +969,9 @@ remove_layer = Control-Shift-L
         if not PSD_SUPPORT:
             messagebox.showerror("Błąd", "Obsługa PSD nie jest dostępna. Zainstaluj psd-tools: pip install psd-tools")
             return
+        if self.loading_image:
+            messagebox.showinfo("Informacja", "Poczekaj, aż obraz zostanie wczytany")
+            return
             
         file_path = filedialog.askssaveasfilename(defaultextension=".psd", 
                                                 filetypes=[("PSD files", "*.psd")])
@@ -616,6 +997,9 @@ remove_layer = Control-Shift-L
         file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.psd"), 
                                                          ("All files", "*.*")])
         if file_path:
+            # Nowy plik przerywa wczytywanie poprzedniego
+            self.loading_image = None
+            self.root.config(cursor="")
             try:
                 if file_path.lower().endswith('.psd') and PSD_SUPPORT:
                     # Open PSD file
@@ -623,6 +1007,7 @@ remove_layer = Control-Shift-L
                     
                     # Clear existing layers
                     self.layers = []
+                    self.layers_before_loading = None
                     
                     # Add layers from PSD
                     for i, layer in enumerate(psd):
@@ -631,7 +1016,6 @@ remove_layer = Control-Shift-L
                             new_layer.image = layer.topil().convert("RGBA")
                             new_layer.visible = layer.visible
                             new_layer.opacity = int(layer.opacity * 255 / 100)  # Convert from percentage
-                            new_layer.draw = ImageDraw.Draw(new_layer.image)
                             self.layers.append(new_layer)
                     
                     if not self.layers:
@@ -640,19 +1024,9 @@ remove_layer = Control-Shift-L
                     
                     self.active_layer_index = 0
                 else:
-                    # Open regular image file
-                    image = Image.open(file_path).convert("RGBA")
-                    
-                    # Clear existing layers
-                    self.layers = []
-                    
-                    # Create a new layer with the image
-                    new_layer = Layer("Obraz", self.canvas_width, self.canvas_height)
-                    new_layer.image = image
-                    new_layer.draw = ImageDraw.Draw(new_layer.image)
-                    self.layers.append(new_layer)
-                    
-                    self.active_layer_index = 0
+                    # Open regular image file - w tle, żeby duże obrazy nie blokowały programu
+                    self.start_loading_image(file_path)
+                    return
                 
                 self.update_layer_list()
                 self.update_canvas()
@@ -661,8 +1035,126 @@ remove_layer = Control-Shift-L
             except Exception as e:
                 messagebox.showerror("Błąd", f"Nie udało się otworzyć pliku: {e}")
             
+    def start_loading_image(self, file_path):
+        """Wczytuje zwykły obraz w wątku: najpierw podgląd, potem pełna rozdzielczość"""
+        token = self.loading_image = object()
+        if self.layers_before_loading is None:
+            # Przy kolejnym pliku w trakcie wczytywania na ekranie może być już podgląd - zachowujemy pierwotne warstwy
+            self.layers_before_loading = (self.layers, self.active_layer_index)
+        results = queue.Queue()
+        downsample = self.config.getboolean('Settings', 'downsample_on_import', fallback=False)
+        threading.Thread(target=self.load_image_worker, args=(file_path, downsample, token, results), daemon=True).start()
+        self.root.config(cursor="watch")
+        self.poll_loading_image(token, results)
+        
+    def load_image_worker(self, file_path, downsample, token, results):
+        """Dekoduje obraz w tle (bez dostępu do Tkintera), wyniki przekazuje przez kolejkę"""
+        canvas_size = (self.canvas_width, self.canvas_height)
+        
+        def cancelled():
+            # Nowy plik lub nowy canvas - przerywamy przed każdym kosztownym krokiem
+            return self.loading_image is not token
+        
+        try:
+            if cancelled():
+                return
+            image = Image.open(file_path)
+            full_size = image.size
+            self.reduced_decode(image, canvas_size)
+            # Rozmiar po zmniejszonym dekodowaniu JPEG 2000 znany jest dopiero po wczytaniu
+            image.load()
+            if cancelled():
+                return
+            if downsample:
+                # Import w rozmiarze canvasa - przy JPEG i JPEG 2000 pełna rozdzielczość nie trafia do pamięci
+                image.thumbnail(canvas_size)
+            else:
+                results.put(("preview", self.make_image_layer(self.preview_image(image, full_size))))
+                if image.size != full_size:
+                    if cancelled():
+                        return
+                    # Zmniejszone dekodowanie działa tylko przed wczytaniem, więc pełny obraz otwieramy od nowa
+                    image = Image.open(file_path)
+            if cancelled():
+                return
+            results.put(("image", self.make_image_layer(image)))
+        except Exception as e:
+            results.put(("error", e))
+        
+    def reduced_decode(self, image, size):
+        """Włącza dekodowanie w zmniejszonej skali (nie mniejszej niż size), jeśli format na to pozwala
+
+        JPEG używa draft mode (skala 1/2-1/8), JPEG 2000 poziomów rozdzielczości (reduce).
+        Pozostałe formaty (PNG, TIFF, WebP, BMP...) Pillow zawsze dekoduje w całości, więc
+        dla nich podgląd pojawia się dopiero po pełnym dekodowaniu - przyspiesza tylko to,
+        że pokazujemy go przed konwersją całego obrazu do bufora warstwy.
+        """
+        image.draft("RGB", size)
+        if image.format == "JPEG2000":
+            # Każdy poziom to połowa rozdzielczości; domyślne kodery zapisują 6 poziomów (reduce do 5)
+            level = 0
+            while (level < 5 and image.width >> (level + 1) >= size[0]
+                   and image.height >> (level + 1) >= size[1]):
+                level += 1
+            image.reduce = level
+        
+    def preview_image(self, image, full_size):
+        """Przybliżenie widocznego fragmentu (lewy górny róg w skali 1:1) ze zmniejszonego obrazu"""
+        visible = (min(self.canvas_width, full_size[0]), min(self.canvas_height, full_size[1]))
+        region = (0, 0,
+                  max(1, round(visible[0] * image.width / full_size[0])),
+                  max(1, round(visible[1] * image.height / full_size[1])))
+        preview = image.crop(region)
+        return preview.resize(visible) if preview.size != visible else preview
+        
+    def make_image_layer(self, image):
+        """Tworzy warstwę "Obraz" z wczytanego obrazu"""
+        layer = Layer("Obraz", self.canvas_width, self.canvas_height)
+        layer.image = image
+        return layer
+        
+    def poll_loading_image(self, token, results):
+        """Odbiera wyniki wątku wczytującego i podmienia warstwy na głównym wątku"""
+        if self.loading_image is not token:
+            return  # Wczytywanie przerwane nowym canvasem lub innym plikiem
+        try:
+            kind, result = results.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self.poll_loading_image, token, results)
+            return
+        
+        if kind == "error":
+            self.loading_image = None
+            self.root.config(cursor="")
+            # Podgląd nie może zostać jako warstwa do edycji
+            self.layers, self.active_layer_index = self.layers_before_loading
+            self.layers_before_loading = None
+            self.update_layer_list()
+            self.update_canvas()
+            messagebox.showerror("Błąd", f"Nie udało się otworzyć pliku: {result}")
+            return
+        
+        # Podgląd i pełny obraz zastępują wszystkie warstwy
+        self.layers = [result]
+        self.active_layer_index = 0
+        self.update_layer_list()
+        self.update_canvas()
+        
+        if kind == "preview":
+            self.root.after(50, self.poll_loading_image, token, results)
+        else:
+            self.loading_image = None
+            self.layers_before_loading = None
+            self.root.config(cursor="")
+            self.save_state()  # Zapisz stan po załadowaniu obrazu
+        
     def new_canvas(self, event=None):
         """Create new canvas"""
+        # Przerwij ewentualne wczytywanie obrazu w tle
+        self.loading_image = None
+        self.layers_before_loading = None
+        self.root.config(cursor="")
+        
         # Clear all layers
         self.layers = []
         
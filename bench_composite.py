@@ -0,0 +1,125 @@
+"""Porównanie starej ścieżki PIL (straight alpha) z rdzeniem premultiplied NumPy
+
+Uruchomienie: python bench_composite.py [szerokość wysokość liczba_warstw]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from artistic import Layer, band_boxes, composite_box
+
+
+def legacy_get_image(image, opacity):
+    """Dawna Layer.get_image - przezroczystość przez split/point/putalpha"""
+    if opacity < 255:
+        alpha = image.split()[3]
+        alpha = alpha.point(lambda p: p * opacity // 255)
+        result = image.copy()
+        result.putalpha(alpha)
+        return result
+    return image
+
+
+def legacy_composite(images, opacities, size):
+    """Dawne DrawingApp.get_composite_image"""
+    composite = Image.new("RGBA", size, (255, 255, 255, 255))
+    for image, opacity in zip(images, opacities):
+        composite = Image.alpha_composite(composite, legacy_get_image(image, opacity))
+    return composite.convert("RGB")
+
+
+def numpy_composite(layers, size, box=None):
+    """Nowa kompozycja NumPy (domyślnie dla całego canvasa)"""
+    return composite_box(layers, box or (0, 0) + size)
+
+
+def banded_composite(layers, size, pool, workers):
+    """Nowe DrawingApp.get_composite_image - pasma składane w puli wątków"""
+    bands = band_boxes(size[0], size[1], workers)
+    if len(bands) < 2:
+        return composite_box(layers, (0, 0) + size)
+    composite = Image.new("RGB", size)
+    for box, band in zip(bands, pool.map(lambda box: composite_box(layers, box), bands)):
+        composite.paste(band, box[:2])
+    return composite
+
+
+def legacy_erase(image, line, size):
+    ImageDraw.Draw(image).line(line, fill=(0, 0, 0, 0), width=size)
+
+
+def measure(function, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_layers(count, size, content):
+    """Tworzy warstwy jako obrazy PIL (stara ścieżka) i obiekty Layer (nowa)"""
+    images, layers = [], []
+    for i in range(count):
+        image = content(i)
+        layer = Layer(f"Warstwa {i + 1}", size[0], size[1], opacity=128 if i % 2 == 0 else 255)
+        layer.image = image
+        images.append(image)
+        layers.append(layer)
+    return images, layers
+
+
+def main():
+    width, height, count = (int(arg) for arg in sys.argv[1:4]) if len(sys.argv) > 3 else (1920, 1080, 8)
+    size = (width, height)
+    rng = np.random.default_rng(0)
+
+    def dense(i):
+        return Image.fromarray(rng.integers(0, 256, (height, width, 4), dtype=np.uint8))
+
+    def sparse(i):
+        # Typowa warstwa rysunku - kilka pociągnięć na przezroczystym tle
+        image = Image.new("RGBA", size, (0, 0, 0, 0))
+        left, top = (i * width // (count + 1), i * height // (count + 1))
+        ImageDraw.Draw(image).line([(left, top), (left + width // 4, top + height // 4)],
+                                   fill=(200, 30, 60, 255), width=12)
+        return image
+
+    dense_images, dense_layers = make_layers(count, size, dense)
+    sparse_images, sparse_layers = make_layers(count, size, sparse)
+    opacities = [layer.opacity for layer in dense_layers]
+
+    # Pojedyncze zdarzenie ruchu myszy: krótki odcinek i jego brudny prostokąt
+    line = [(100, 100), (130, 112)]
+    box = (80, 80, 151, 133)
+    workers = os.cpu_count() or 1
+    pool = ThreadPoolExecutor(max_workers=workers)
+    results = [
+        ("composite (gęste)", measure(lambda: legacy_composite(dense_images, opacities, size)),
+                              measure(lambda: numpy_composite(dense_layers, size))),
+        (f"pasma, {workers} wątk.", measure(lambda: legacy_composite(dense_images, opacities, size)),
+                                  measure(lambda: banded_composite(dense_layers, size, pool, workers))),
+        ("composite (rzadkie)", measure(lambda: legacy_composite(sparse_images, opacities, size)),
+                                measure(lambda: numpy_composite(sparse_layers, size))),
+        ("opacity", measure(lambda: legacy_composite(dense_images[:1], [128], size)),
+                    measure(lambda: numpy_composite(dense_layers[:1], size))),
+        ("erase", measure(lambda: legacy_erase(dense_images[0], line, 20)),
+                  measure(lambda: dense_layers[0].paint_line(box, line, 20))),
+        # Całe zdarzenie gumki: odcinek i odświeżenie canvasa (dawniej cała klatka, teraz brudny prostokąt)
+        ("erase + odświeżenie", measure(lambda: (legacy_erase(dense_images[0], line, 20),
+                                                 legacy_composite(dense_images, opacities, size))),
+                                measure(lambda: (dense_layers[0].paint_line(box, line, 20),
+                                                 numpy_composite(dense_layers, size, box)))),
+    ]
+
+    print(f"{width}x{height}, {count} warstw")
+    for name, legacy, numpy_time in results:
+        print(f"{name:20} PIL {legacy * 1000:8.2f} ms   NumPy {numpy_time * 1000:8.2f} ms   x{legacy / numpy_time:.2f}")
+
+
+if __name__ == "__main__":
+    main()